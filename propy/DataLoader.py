@@ -1,7 +1,12 @@
 import os
 
+import json
 import pickle
 import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterable
 
 from propy.prop import *
 from propy.DataUtil import *
@@ -11,28 +16,127 @@ from sklearn.model_selection import KFold
 
 def dump_batch(instance, path, name):
     with open(os.path.join(path, name), 'wb') as f:
-        pickle.dump(instance, f)
+        pickle.dump(instance, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def dump_batches(instances: Iterable, num_instances: int, path, name):
+    """
+    Dump instances to a single file of
+        [num_instances: int64, offsets: int64 * (num_instances + 1), pickled instance * num_instances],
+    where the i-th instance is in [offsets[i], offsets[i+1]) of the file.
+    Instances are pickled one by one, so instances can be a generator not to keep all of them in memory.
+    """
+    file_path_and_name = os.path.join(path, name)
+    # Write to a temporary file not to destroy the previous dump if pickling an instance fails.
+    temp_file_path_and_name = file_path_and_name + ".tmp"
+    offsets = np.zeros(num_instances + 1, dtype=np.int64)
+    with open(temp_file_path_and_name, 'wb') as f:
+        f.write(np.asarray([num_instances], dtype=np.int64).tobytes())
+        f.write(offsets.tobytes())
+        offsets[0] = f.tell()
+        num_dumped = 0
+        for instance in instances:
+            pickle.dump(instance, f, protocol=pickle.HIGHEST_PROTOCOL)
+            num_dumped += 1
+            offsets[num_dumped] = f.tell()
+        assert num_dumped == num_instances
+        f.seek(8)
+        f.write(offsets.tobytes())
+    os.replace(temp_file_path_and_name, file_path_and_name)
+
+
+def load_batches(path, name) -> Generator:
+    """
+    Load instances one by one from a file written by dump_batches.
+    """
+    with open(os.path.join(path, name), 'rb') as f:
+        num_instances = int(np.frombuffer(f.read(8), dtype=np.int64)[0])
+        offsets = np.frombuffer(f.read(8 * (num_instances + 1)), dtype=np.int64)
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            f.seek(start)
+            yield pickle.loads(f.read(end - start))
+
+
+def dump_x_features(x_features: np.ndarray, path, name):
+    file_path_and_name = os.path.join(path, name)
+    # Write to a temporary file not to truncate the file that can be mapped by loaded x_features.
+    temp_file_path_and_name = file_path_and_name + ".tmp"
+    with open(temp_file_path_and_name, 'wb') as f:
+        np.save(f, x_features)
+    os.replace(temp_file_path_and_name, file_path_and_name)
+
+
+def dump_manifest(manifest: dict, path, name_prefix):
+    with open(os.path.join(path, "{}.manifest.json".format(name_prefix)), 'w') as f:
+        json.dump(manifest, f)
+
+
+def load_manifest(path, name_prefix) -> dict or None:
+    try:
+        with open(os.path.join(path, "{}.manifest.json".format(name_prefix)), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
 
 
 def assign_or_concat(base_sequence, extra_sequence):
 
     if base_sequence is None:
-        return extra_sequence
+        return list(extra_sequence) if isinstance(extra_sequence, list) else extra_sequence
 
     if isinstance(base_sequence, list):
-        return base_sequence + extra_sequence
+        base_sequence.extend(extra_sequence)
+        return base_sequence
     elif isinstance(base_sequence, np.ndarray):
         return np.concatenate((base_sequence, extra_sequence))
     else:
         raise TypeError
 
 
+def get_num_classes(ys: np.ndarray) -> int or None:
+    """
+    :param ys: one-hot ndarray of shape (num_info, num_classes) or label ndarray of shape (num_info,)
+    :return: num_classes, or None if it cannot be inferred from empty labels
+    """
+    if ys is None:
+        return None
+    elif ys.ndim > 1:
+        return ys.shape[1]
+    elif len(ys) != 0:
+        return int(ys.max()) + 1
+    else:
+        return None
+
+
+def append_chunk(chunks: List[np.ndarray], extra_chunk: np.ndarray):
+    if extra_chunk is not None and len(extra_chunk) != 0:
+        chunks.append(extra_chunk)
+
+
+def get_concatenated_chunks(chunks: List[np.ndarray]) -> np.ndarray or None:
+    """
+    Concatenate chunks once and keep the result as the only chunk, so that
+    it is reused until another chunk is appended.
+    """
+    if len(chunks) > 1:
+        chunks[:] = [np.concatenate(chunks)]
+    return chunks[0] if chunks else None
+
+
 class ActionMatrixLoader:
 
-    __slots__ = ["path", "actions", "edge_indices_list", "selected_node_indices", "x_features", "y_features", "ys",
-                 "num_x_features", "num_y_features", "num_classes", "is_coo_repr", "is_x_indices_repr"]
+    __slots__ = ["path", "actions", "edge_indices_list", "edge_values_list",
+                 "selected_node_indices", "encoded_selected_node_indices",
+                 "_x_features_chunks", "_y_features_chunks", "_ys_chunks", "x_features_file_name",
+                 "num_x_features", "num_y_features", "num_classes", "is_coo_repr", "is_x_indices_repr",
+                 "item_cache_size", "_cached_get_item", "_fold_cache"]
 
-    def __init__(self, path: str, actions: list, is_coo_repr=True, is_x_indices_repr=False, path_exist_ok=True):
+    def __init__(self, path: str, actions: list, is_coo_repr=True, is_x_indices_repr=False, path_exist_ok=True,
+                 item_cache_size=0):
+        """
+        :param item_cache_size: max number of items of self[item] to keep in an LRU cache, 0 means no cache.
+                                Items in the cache are read-only.
+        """
 
         self.path: str = path
         os.makedirs(self.path, exist_ok=path_exist_ok)
@@ -46,20 +150,77 @@ class ActionMatrixLoader:
         self.is_coo_repr = is_coo_repr
         self.is_x_indices_repr = is_x_indices_repr
 
-        # (num_info, num_actions, num_edges, 3:[i, j, val])
+        self.item_cache_size = item_cache_size
+        self._cached_get_item = None
+        self.clear_item_cache()
+
+        # (n_splits, num_info) -> list of (train_idx, test_idx) of KFold
+        self._fold_cache: Dict[Tuple[int, int], List[Tuple[np.ndarray, np.ndarray]]] = dict()
+
+        # (num_info, num_actions, 2, num_edges)
         self.edge_indices_list: List[List[np.ndarray]] = None
 
+        # (num_info, num_actions, num_edges)
+        self.edge_values_list: List[List[np.ndarray]] = None
+
         # (num_info, num_selected_nodes)
         self.selected_node_indices: List[np.ndarray] = None
 
+        # Tuple of int32 deltas & pointers of selected_node_indices, which is set only for dumped instances.
+        self.encoded_selected_node_indices: Tuple[np.ndarray, np.ndarray] = None
+
         # (num_nodes, num_features)
-        self.x_features: np.ndarray = None
+        self._x_features_chunks: List[np.ndarray] = []
+
+        # Name of .npy file of x_features in self.path, which is set only for dumped instances.
+        self.x_features_file_name: str = None
 
         # (num_info, num_y_features)
-        self.y_features: np.ndarray = None
+        self._y_features_chunks: List[np.ndarray] = []
 
         # (num_info, num_classes)
-        self.ys: np.ndarray = None
+        self._ys_chunks: List[np.ndarray] = []
+
+    @property
+    def x_features(self) -> np.ndarray:
+        return get_concatenated_chunks(self._x_features_chunks)
+
+    @x_features.setter
+    def x_features(self, x_features: np.ndarray):
+        self.clear_item_cache()
+        self._x_features_chunks = [x_features] if x_features is not None else []
+
+    @property
+    def y_features(self) -> np.ndarray:
+        return get_concatenated_chunks(self._y_features_chunks)
+
+    @y_features.setter
+    def y_features(self, y_features: np.ndarray):
+        self.clear_item_cache()
+        self._y_features_chunks = [y_features] if y_features is not None else []
+
+    @property
+    def ys(self) -> np.ndarray:
+        return get_concatenated_chunks(self._ys_chunks)
+
+    @ys.setter
+    def ys(self, ys: np.ndarray):
+        self.clear_item_cache()
+        self._ys_chunks = [ys] if ys is not None else []
+
+    def __getstate__(self):
+        # lru_cache of a bound method cannot be pickled, so it is rebuilt in __setstate__.
+        slot_state = {slot: getattr(self, slot) for slot in self.__slots__
+                      if slot != "_cached_get_item" and hasattr(self, slot)}
+        return None, slot_state
+
+    def __setstate__(self, state):
+        _, slot_state = state
+        for slot, value in slot_state.items():
+            setattr(self, slot, value)
+        if not hasattr(self, "item_cache_size"):
+            self.item_cache_size = 0
+        self.clear_item_cache()
 
     def __len__(self):
         assert len(self.edge_indices_list) == len(self.ys)
@@ -92,17 +253,40 @@ class ActionMatrixLoader:
         TODO: Support slice as an item.
         TODO: Support not is_binary_repr for is_coo_repr & is_binary_repr for not is_coo_repr
         """
+        if self._cached_get_item is not None:
+            return self._cached_get_item(item, self.is_coo_repr, self.is_x_indices_repr)
+        return self._get_item(item)
+
+    def _get_read_only_item(self, item, *repr_flags) -> Tuple:
+        # repr_flags are not used but keys of the cache, so items of other representations are not returned.
+        elements = self._get_item(item)
+        for element in elements:
+            for arr in (element if isinstance(element, list) else [element]):
+                # Elements of 1-D ys are NumPy scalars, which are immutable already.
+                if isinstance(arr, np.ndarray):
+                    arr.flags.writeable = False
+        return elements
+
+    def clear_item_cache(self):
+        if self.item_cache_size > 0:
+            self._cached_get_item = lru_cache(maxsize=self.item_cache_size)(self._get_read_only_item)
+        else:
+            self._cached_get_item = None
+
+    def _get_item(self, item) -> Tuple:
         indices = self.selected_node_indices[item]
         if self.is_coo_repr:
-            matrices_in_list_form = self.edge_indices_list[item]
-            matrices = [list_to_coo(lst) for lst in matrices_in_list_form]
+            matrices = self.edge_indices_list[item]
         else:
-            matrices = [list_to_matrix(lst, size=len(indices)) for lst in self.edge_indices_list[item]]
+            edge_indices, edge_values = self.edge_indices_list[item], self.edge_values_list[item]
+            matrices = np.zeros((len(edge_indices), len(indices), len(indices)), dtype=np.int64)
+            for k, (coo, values) in enumerate(zip(edge_indices, edge_values)):
+                coo_to_matrix(coo, values, size=len(indices), out=matrices[k])
 
         if self.is_x_indices_repr:
             x_features_or_indices = indices
         else:
-            x_features_or_indices = self.x_features[indices]
+            x_features_or_indices = np.take(self.x_features, indices, axis=0)
 
         if self.y_features is not None:
             return matrices, x_features_or_indices, self.y_features[item], self.ys[item]
@@ -115,33 +299,79 @@ class ActionMatrixLoader:
                             seed=None,
                             is_train=None,
                             train_ratio=0.8,
-                            fold=0) -> Generator:
-
-        data_m, data_xf, data_yf, data_y = [], [], [], []
+                            fold=0,
+                            is_stacked_repr=False,
+                            num_workers=0) -> Generator:
+        """
+        :param is_stacked_repr: Boolean flag to yield a batch as stacked ndarrays. See self.get_stacked_batch
+        :param num_workers: number of threads that prefetch batches, 0 means batches are made in the main thread
+        :return: generator of tuples of lists of self[idx]'s elements (or stacked ones if is_stacked_repr)
+        """
+        if is_stacked_repr:
+            self._check_stackable()
 
-        indexes = np.asarray(range(len(self)))
+        indexes = np.arange(len(self), dtype=np.int64)
 
         if shuffle:
             np.random.seed(seed)
             np.random.shuffle(indexes)
 
         if is_train is not None:
-            kf = KFold(n_splits=int(1/(1-train_ratio)), random_state=seed, shuffle=shuffle)
-            assert kf.get_n_splits() > fold
-            for i, (train_idx, test_idx) in enumerate(kf.split(indexes)):
+            # indexes are already shuffled, so KFold splits depend only on n_splits and the number of info.
+            n_splits = int(1/(1-train_ratio))
+            assert n_splits > fold
+            key = (n_splits, len(indexes))
+            if key not in self._fold_cache:
+                self._fold_cache[key] = list(KFold(n_splits=n_splits).split(indexes))
+            train_idx, test_idx = self._fold_cache[key][fold]
+
+            if is_train:
+                indexes = indexes[train_idx]
+            else:
+                indexes = indexes[test_idx]
+
+        get_batch = self.get_stacked_batch if is_stacked_repr else self.get_batch
+        batch_indexes_generator = self._get_batch_indexes_generator(indexes, batch_size)
+
+        if num_workers <= 0:
+            for batch_indexes in batch_indexes_generator:
+                yield get_batch(batch_indexes)
+            return
+
+        # NumPy releases the GIL in gathering and concatenation, so threads are enough to overlap with consumers.
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = deque()
+            for batch_indexes in batch_indexes_generator:
+                futures.append(executor.submit(get_batch, batch_indexes))
+                if len(futures) > 2 * num_workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+
+    def _get_batch_indexes_generator(self, indexes, batch_size) -> Generator:
+        batch_indexes = []
+        for idx in indexes:
 
-                if i != fold:
-                    continue
+            if len(self.selected_node_indices[idx]) <= 0:
+                continue
 
-                if is_train:
-                    indexes = indexes[train_idx]
-                else:
-                    indexes = indexes[test_idx]
+            batch_indexes.append(idx)
 
-        for i, idx in enumerate(indexes):
+            if batch_size and len(batch_indexes) % batch_size == 0:
+                yield batch_indexes
+                batch_indexes = []
 
-            if len(self.selected_node_indices[idx]) <= 0:
-                continue
+        if len(batch_indexes) != 0:
+            yield batch_indexes
+
+    def get_batch(self, batch_indexes) -> Tuple:
+        """
+        :param batch_indexes: ids (int) of info
+        :return: tuple of lists of self[idx]'s elements, the length of which is 3 or 4
+        """
+        data_m, data_xf, data_yf, data_y = [], [], [], []
+
+        for idx in batch_indexes:
 
             if self.y_features is not None:
                 m, xf, yf, y = self[idx]
@@ -153,36 +383,88 @@ class ActionMatrixLoader:
             data_xf.append(xf)
             data_y.append(y)
 
-            if batch_size and len(data_y) % batch_size == 0:
-                yield (data_m, data_xf, data_yf, data_y) if self.y_features is not None else (data_m, data_xf, data_y)
-                data_m, data_xf, data_yf, data_y = [], [], [], []
+        return (data_m, data_xf, data_yf, data_y) if self.y_features is not None else (data_m, data_xf, data_y)
 
-        if len(data_m) != 0:
-            yield (data_m, data_xf, data_yf, data_y) if self.y_features is not None else (data_m, data_xf, data_y)
+    def _check_stackable(self):
+        if not self.is_coo_repr:
+            raise ValueError("is_stacked_repr requires is_coo_repr: dense matrices of info have different sizes, "
+                             "so they can only be stacked as a block-diagonal COO of the batch")
 
-    def update_matrices_and_indices(self, matrices_sequence, selected_node_indices, convert_to_list=True):
+    def get_stacked_batch(self, batch_indexes) -> Tuple:
+        """
+        :param batch_indexes: ids (int) of info
+        :return: tuple of length 4 or 5, where selected nodes of all info are stacked along the first axis.
+            shape of 0: (num_actions, 2, num_batch_edges), block-diagonal COO of the batch,
+            shape of 1: (num_batch_nodes,) if is_x_indices_repr else (num_batch_nodes, num_x_features),
+            shape of 2: (batch_size, num_y_features) if self.y_features is not None,
+            shape of -2: (batch_size, num_classes),
+            shape of -1: (num_batch_nodes,), index in the batch of info that each node belongs to.
+        """
+        self._check_stackable()
+
+        node_indices_of_batch = [self.selected_node_indices[idx] for idx in batch_indexes]
+        num_nodes_of_batch = np.asarray([len(node_indices) for node_indices in node_indices_of_batch])
+        offsets = np.cumsum(num_nodes_of_batch) - num_nodes_of_batch
+        batch = np.repeat(np.arange(len(batch_indexes)), num_nodes_of_batch)
+
+        num_actions = len(self.edge_indices_list[batch_indexes[0]])
+        data_m = [np.concatenate([self.edge_indices_list[idx][k] + offset
+                                  for idx, offset in zip(batch_indexes, offsets)], axis=1)
+                  for k in range(num_actions)]
 
+        node_indices = np.concatenate(node_indices_of_batch)
+        if self.is_x_indices_repr:
+            data_xf = node_indices
+        else:
+            data_xf = np.take(self.x_features, node_indices, axis=0)
+
+        data_y = self.ys[batch_indexes]
+        if self.y_features is not None:
+            return data_m, data_xf, self.y_features[batch_indexes], data_y, batch
+        else:
+            return data_m, data_xf, data_y, batch
+
+    def update_matrices_and_indices(self, matrices_sequence, selected_node_indices, convert_to_list=True,
+                                    edge_values_sequence=None):
+        """
+        :param matrices_sequence: (num_info, num_actions, num_selected_nodes, num_selected_nodes) if convert_to_list,
+                                  else (num_info, num_actions, 2, num_edges) if edge_values_sequence is not None,
+                                  else (num_info, num_actions, num_edges, 3:[i, j, val])
+        :param selected_node_indices: (num_info, num_selected_nodes)
+        :param convert_to_list: Boolean flag to convert dense matrices to COO indices and values
+        :param edge_values_sequence: (num_info, num_actions, num_edges)
+        """
+        self.clear_item_cache()
         if convert_to_list:
-            matrices_sequence_in_list_form = []
+            edge_indices_sequence, edge_values_sequence = [], []
             for matrices in matrices_sequence:
-                matrices_sequence_in_list_form.append([matrix_to_list(mat) for mat in matrices])
-            self.edge_indices_list = assign_or_concat(self.edge_indices_list, matrices_sequence_in_list_form)
+                coo_and_values = [matrix_to_coo(mat) for mat in matrices]
+                edge_indices_sequence.append([coo for coo, _ in coo_and_values])
+                edge_values_sequence.append([values for _, values in coo_and_values])
+        elif edge_values_sequence is None:
+            edge_indices_sequence = [[list_to_coo(lst) for lst in matrices] for matrices in matrices_sequence]
+            edge_values_sequence = [[list_to_edge_attr(lst) for lst in matrices] for matrices in matrices_sequence]
         else:
-            self.edge_indices_list = assign_or_concat(self.edge_indices_list, matrices_sequence)
+            edge_indices_sequence = matrices_sequence
 
+        self.edge_indices_list = assign_or_concat(self.edge_indices_list, edge_indices_sequence)
+        self.edge_values_list = assign_or_concat(self.edge_values_list, edge_values_sequence)
+        selected_node_indices = [np.ascontiguousarray(indices, dtype=np.int64) for indices in selected_node_indices]
         self.selected_node_indices = assign_or_concat(self.selected_node_indices, selected_node_indices)
 
     def update_x_features(self, x_features):
-        if self.x_features is None:
+        self.clear_item_cache()
+        if not self._x_features_chunks:
             self.num_x_features = x_features[0].shape[0]
-        self.x_features = assign_or_concat(self.x_features, x_features)
+        append_chunk(self._x_features_chunks, x_features)
 
     def dynamic_update_x_features(self, update_func: Callable, **kwargs):
         """
         :param update_func: function that takes
                             *(matrices_in_list_form, selected_node_indices, x_features, y_features)
-                             & **kwargs
+                             & **kwargs, where matrices_in_list_form is COO indices of edges.
         """
+        self.clear_item_cache()
         prev_shape = self.x_features.shape
         self.x_features = update_func(
             matrices_in_list_form=self.edge_indices_list,
@@ -194,68 +476,131 @@ class ActionMatrixLoader:
         assert prev_shape == self.x_features.shape
 
     def update_y_features(self, y_features):
-        if self.y_features is None:
+        self.clear_item_cache()
+        if not self._y_features_chunks:
             self.num_y_features = y_features[0].shape[0]
-        self.y_features = assign_or_concat(self.y_features, y_features)
+        append_chunk(self._y_features_chunks, y_features)
 
     def update_ys(self, ys):
-        if self.ys is None:
-            self.num_classes = 4  # TODO
-        self.ys = assign_or_concat(self.ys, ys)
+        self.clear_item_cache()
+        self.update_num_classes(get_num_classes(ys))
+        append_chunk(self._ys_chunks, ys)
+
+    def update_num_classes(self, num_classes):
+        if num_classes is not None:
+            self.num_classes = max(self.num_classes or 0, num_classes)
 
     def dump(self, name_prefix, num_subfiles=1):
 
         assert self.edge_indices_list is not None
         assert len(self.edge_indices_list) == len(self.ys)
 
-        # Dump xs, ys
-        info_batch_size = int(math.ceil(len(self) / num_subfiles))
-        x_batch_size = int(math.ceil(len(self.x_features) / num_subfiles))
+        # Dump xs in a separate file to be memory-mapped in loading
+        x_features_file_name = "{}_x_features.npy".format(name_prefix)
+        dump_x_features(self.x_features, path=self.path, name=x_features_file_name)
+
+        # Matrices, indices, ys of each subfile, where num_subfiles is reduced not to dump empty subfiles
+        info_batch_size = max(int(math.ceil(len(self) / num_subfiles)), 1)
+        num_subfiles = max(int(math.ceil(len(self) / info_batch_size)), 1)
+
+        # Dump subfiles into a single file with offsets, and the manifest not to search self.path in loading
+        shard_file_name = "{}.shards".format(name_prefix)
+        dump_batches(
+            instances=self._get_generator_of_instances_to_dump(num_subfiles, info_batch_size, x_features_file_name),
+            num_instances=num_subfiles,
+            path=self.path,
+            name=shard_file_name,
+        )
+        dump_manifest({"shard_file": shard_file_name}, path=self.path, name_prefix=name_prefix)
 
+        cprint("Dump: {} with num_subfiles {}".format(name_prefix, num_subfiles), "blue")
+
+    def _get_generator_of_instances_to_dump(self, num_subfiles, info_batch_size, x_features_file_name) -> Generator:
         for i in range(num_subfiles):
 
-            info_start, info_end = (i*info_batch_size, (i+1)*info_batch_size)
-            x_start, x_end = (i*x_batch_size, (i+1)*x_batch_size)
+            info_start, info_end = (i*info_batch_size, min((i+1)*info_batch_size, len(self)))
 
             instance_to_dump = ActionMatrixLoader(path=self.path, actions=self.actions)
             instance_to_dump.update_matrices_and_indices(
                 matrices_sequence=self.edge_indices_list[info_start:info_end],
                 selected_node_indices=self.selected_node_indices[info_start:info_end],
                 convert_to_list=False,
+                edge_values_sequence=self.edge_values_list[info_start:info_end],
             )
-            instance_to_dump.update_x_features(self.x_features[x_start:x_end])
+            instance_to_dump.encoded_selected_node_indices = delta_encode_sequence(
+                instance_to_dump.selected_node_indices)
+            instance_to_dump.selected_node_indices = None
+            if i == 0:
+                instance_to_dump.x_features_file_name = x_features_file_name
             instance_to_dump.update_ys(self.ys[info_start:info_end])
             if self.y_features is not None:
                 instance_to_dump.update_y_features(self.y_features[info_start:info_end])
-            dump_batch(instance=instance_to_dump, path=self.path, name="{}_{}.pkl".format(name_prefix, i))
-
-        cprint("Dump: {} with num_subfiles {}".format(name_prefix, num_subfiles), "blue")
+            yield instance_to_dump
 
     def load(self, name_prefix):
         # Load xs, ys
-        file_names_of_prefix = [f for f in os.listdir(self.path) if f.startswith(name_prefix) and f.endswith(".pkl")]
+        manifest = load_manifest(path=self.path, name_prefix=name_prefix)
+        load_func = self._load_batch
+        if manifest is None:
+            file_names_of_prefix = [f for f in os.listdir(self.path)
+                                    if f.startswith(name_prefix) and f.endswith(".pkl")]
+        else:
+            file_names_of_prefix = [manifest["shard_file"]]
+            load_func = self._load_shard_file
 
         if not file_names_of_prefix:
             return False
 
         for file_name in file_names_of_prefix:
-            if not self._load_batch(path=self.path, name=file_name):
+            if not load_func(path=self.path, name=file_name):
                 cprint("Load Failed in Loading {}".format(file_names_of_prefix), "red")
                 return False
 
         cprint("Loaded: {}".format(file_names_of_prefix), "green")
         return True
 
+    def _load_shard_file(self, path, name):
+        try:
+            for loaded in load_batches(path, name):
+                self._update_by_loaded(path, loaded)
+            return True
+        except Exception as e:
+            cprint('Load Failed: {} \n\t{}.\n'.format(os.path.join(path, name), e), "red")
+            return False
+
     def _load_batch(self, path, name):
         try:
             with open(os.path.join(path, name), 'rb') as f:
-                loaded: ActionMatrixLoader = pickle.load(f)
-                self.edge_indices_list = assign_or_concat(self.edge_indices_list, loaded.edge_indices_list)
-                self.selected_node_indices = assign_or_concat(self.selected_node_indices, loaded.selected_node_indices)
-                self.x_features = assign_or_concat(self.x_features, loaded.x_features)
-                self.y_features = assign_or_concat(self.y_features, loaded.y_features)
-                self.ys = assign_or_concat(self.ys, loaded.ys)
+                self._update_by_loaded(path, pickle.load(f))
             return True
         except Exception as e:
             cprint('Load Failed: {} \n\t{}.\n'.format(os.path.join(path, name), e), "red")
             return False
+
+    def _update_by_loaded(self, path, loaded):
+        encoded_selected_node_indices = getattr(loaded, "encoded_selected_node_indices", None)
+        if encoded_selected_node_indices is not None:
+            selected_node_indices = delta_decode_sequence(*encoded_selected_node_indices)
+        else:
+            selected_node_indices = loaded.selected_node_indices
+        self.update_matrices_and_indices(
+            matrices_sequence=loaded.edge_indices_list,
+            selected_node_indices=selected_node_indices,
+            convert_to_list=False,
+            # Files dumped before edge_values_list was introduced keep [i, j, val] lists.
+            edge_values_sequence=getattr(loaded, "edge_values_list", None),
+        )
+        x_features_file_name = getattr(loaded, "x_features_file_name", None)
+        if x_features_file_name is not None:
+            x_features = np.load(os.path.join(path, x_features_file_name), mmap_mode="r")
+            if not self._x_features_chunks:
+                self.num_x_features = x_features.shape[1]
+            append_chunk(self._x_features_chunks, x_features)
+        else:
+            append_chunk(self._x_features_chunks, loaded.x_features)
+        if not self._y_features_chunks:
+            self.num_y_features = loaded.num_y_features
+        append_chunk(self._y_features_chunks, loaded.y_features)
+        # Not loaded.num_classes, since dumps of old versions have a hardcoded value.
+        self.update_num_classes(get_num_classes(loaded.ys))
+        append_chunk(self._ys_chunks, loaded.ys)
@@ -1,3 +1,5 @@
+from typing import List, Tuple
+
 import numpy as np
 from sklearn.preprocessing import normalize
 
@@ -18,19 +20,55 @@ def random_feature(num_nodes, num_features, is_normalized=True):
         return features
 
 
-def matrix_to_list(matrix, default_value=0):
-    lst = []
-    for i, row in enumerate(matrix):
-        for j, val in enumerate(row):
-            if val != default_value:
-                lst.append([i, j, val])
-    return lst
+def matrix_to_coo(matrix, default_value=0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param matrix: ndarray of shape (size, size)
+    :param default_value: value of cells that are not listed
+    :return: tuple of ndarray of shape (2, num_edges) and ndarray of shape (num_edges,)
+    """
+    matrix = np.asarray(matrix)
+    if default_value == 0:
+        rows, cols = np.nonzero(matrix)
+    else:
+        rows, cols = np.nonzero(matrix != default_value)
+    return np.stack([rows, cols]).astype(np.int64), matrix[rows, cols]
+
+
+def coo_to_matrix(coo, values, size, default_value=0, out=None):
+    """
+    :param coo: ndarray of shape (2, num_edges)
+    :param values: ndarray of shape (num_edges,)
+    :param size: number of rows (and columns) of the matrix
+    :param default_value: value of cells not in coo
+    :param out: ndarray of shape (size, size) already filled with default_value, to write the matrix into
+    :return: ndarray of shape (size, size)
+    """
+    matrix = np.full(shape=(size, size), fill_value=default_value) if out is None else out
+    matrix[coo[0], coo[1]] = values
+    return matrix
+
+
+def matrix_to_list(matrix, default_value=0) -> np.ndarray:
+    """
+    :param matrix: ndarray of shape (size, size)
+    :param default_value: value of cells that are not listed
+    :return: ndarray of shape (num_edges, 3:[i, j, val])
+    """
+    coo, vals = matrix_to_coo(matrix, default_value)
+    return np.stack([coo[0], coo[1], vals], axis=1)
 
 
 def list_to_matrix(lst, size, default_value=0):
+    """
+    :param lst: list or ndarray of [u, v, val]
+    :param size: number of rows (and columns) of the matrix
+    :param default_value: value of cells not in lst
+    :return: ndarray of shape (size, size)
+    """
+    arr = np.asarray(lst)
     matrix = np.full(shape=(size, size), fill_value=default_value)
-    for i, j, val in lst:
-        matrix[i][j] = val
+    if arr.size:
+        matrix[arr[:, 0].astype(np.intp), arr[:, 1].astype(np.intp)] = arr[:, 2]
     return matrix
 
 
@@ -40,11 +78,11 @@ def list_to_coo(lst) -> np.ndarray:
     :return: ndarray of shape (2, num_edges)
     """
     if len(lst) == 0:
-        return np.asarray([[], []])
+        return np.asarray([[], []], dtype=np.int64)
     else:
         arr = np.asarray(lst)
         coo = np.transpose(arr[:, :2])
-        return coo.astype(np.int)
+        return coo.astype(np.int64)
 
 
 def list_to_edge_attr(lst) -> np.ndarray:
@@ -52,4 +90,28 @@ def list_to_edge_attr(lst) -> np.ndarray:
     :param lst: list of [u, v, val]
     :return: ndarray of shape (num_edges,)
     """
-    return np.asarray([val for (_, _, val) in lst])
+    arr = np.asarray(lst)
+    return arr[:, 2] if arr.ndim == 2 else np.empty(0, dtype=np.float64)
+
+
+def delta_encode_sequence(sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param sequence: sequence of 1d integer ndarrays
+    :return: tuple of concatenated int32 deltas of each ndarray and int64 pointers of shape (len(sequence) + 1,)
+    """
+    pointers = np.cumsum([0] + [len(x) for x in sequence]).astype(np.int64)
+    deltas = [np.ediff1d(np.asarray(x, dtype=np.int64), to_begin=x[:1]) for x in sequence]
+    deltas = np.concatenate(deltas) if deltas else np.empty(0, dtype=np.int64)
+    int32_info = np.iinfo(np.int32)
+    if len(deltas) != 0 and (deltas.min() < int32_info.min or deltas.max() > int32_info.max):
+        raise OverflowError("Deltas of indices do not fit in int32")
+    return deltas.astype(np.int32), pointers
+
+
+def delta_decode_sequence(deltas, pointers) -> List[np.ndarray]:
+    """
+    :param deltas: ndarray of concatenated deltas
+    :param pointers: ndarray of start (and end) positions of each ndarray in deltas
+    :return: list of 1d int64 ndarrays
+    """
+    return [np.cumsum(deltas[start:end], dtype=np.int64) for start, end in zip(pointers[:-1], pointers[1:])]
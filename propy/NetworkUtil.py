@@ -3,6 +3,7 @@ from typing import Callable, Any, List, Tuple
 
 import networkx as nx
 import numpy as np
+import scipy.sparse as sp
 import matplotlib.pyplot as plt
 
 
@@ -211,3 +212,28 @@ def to_numpy_array(G, nodelist=None, dtype=None, order=None,
     A[np.isnan(A)] = nonedge
     A = np.asarray(A, dtype=dtype)
     return A
+
+
+def to_csr_matrix(G, nodelist=None, dtype=None, weight='weight'):
+    """
+    Sparse counterpart of to_numpy_array, where edges without weight are not stored.
+    """
+    if nodelist is None:
+        nodelist = list(G)
+    nlen = len(nodelist)
+    index = dict(zip(nodelist, range(nlen)))
+    if len(index) != nlen:
+        msg = "Ambiguous ordering: `nodelist` contained duplicates."
+        raise nx.NetworkXError(msg)
+
+    rows, cols, vals = [], [], []
+    for u, nbrdict in G.adjacency():
+        if u not in index:
+            continue
+        for v, d in nbrdict.items():
+            if v in index and weight in d:
+                rows.append(index[u])
+                cols.append(index[v])
+                vals.append(d[weight])
+
+    return sp.csr_matrix((np.asarray(vals, dtype=dtype or float), (rows, cols)), shape=(nlen, nlen))
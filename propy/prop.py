@@ -27,6 +27,11 @@ class NetworkPropagation(nx.DiGraph):
         self.seed = seed
         super().__init__(**attr)
 
+        # Cache of CSR snapshots of actions, which is cleared whenever actions are changed.
+        self.action_to_csr_matrix: Dict = None
+        self.node_to_index: Dict = None
+        self.clear_action_matrix_cache()
+
         self.add_nodes_from(nodes)
         self.add_edges_from(edges, follow=1)
 
@@ -102,25 +107,49 @@ class NetworkPropagation(nx.DiGraph):
         return [a for a in self.user_actions if key in a]
 
     def get_action_matrix(self, action_key: str,
-                          time_stamp: int or float = None, is_binary_repr=False, nodelist: list = None) -> np.ndarray:
+                          time_stamp: int or float = None, is_binary_repr=False, nodelist: list = None,
+                          is_sparse_repr=False) -> np.ndarray:
         """
         :param action_key: str in self.user_actions
         :param time_stamp: Remove actions time of which is greater than time_stamp
         :param is_binary_repr: convert all positive integers to one
         :param nodelist: The rows and columns are ordered according to the nodes in nodelist.
+        :param is_sparse_repr: return scipy.sparse.csr_matrix instead of dense ndarray
         :return:
         """
         assert action_key in self.user_actions
 
-        action_matrix = nu.to_numpy_matrix(self, nodelist=nodelist, weight=action_key, value_for_non_weight_exist=0)
+        action_matrix = self._get_csr_matrix_of_action(action_key, nodelist)
 
         if time_stamp is not None:
-            action_matrix = np.multiply(action_matrix, action_matrix <= time_stamp)
+            action_matrix.data[action_matrix.data > time_stamp] = 0
+            action_matrix.eliminate_zeros()
 
         if is_binary_repr:
-            return nu.to_binary_repr(action_matrix)
-        else:
-            return action_matrix
+            action_matrix = nu.to_binary_repr(action_matrix)
+
+        return action_matrix if is_sparse_repr else action_matrix.toarray()
+
+    def _get_csr_matrix_of_action(self, action_key: str, nodelist: list = None):
+        if action_key not in self.action_to_csr_matrix:
+            self.action_to_csr_matrix[action_key] = nu.to_csr_matrix(self, weight=action_key)
+        action_matrix = self.action_to_csr_matrix[action_key]
+
+        if nodelist is None:
+            return action_matrix.copy()
+
+        if self.node_to_index is None:
+            self.node_to_index = {node: index for index, node in enumerate(self)}
+        indices = [self.node_to_index[node] for node in nodelist]
+        return action_matrix[indices][:, indices]
+
+    def clear_action_matrix_cache(self):
+        """
+        Call this after changing edges or their attributes via NetworkX methods (e.g. self.add_edge),
+        since only methods of NetworkPropagation clear the cache automatically.
+        """
+        self.action_to_csr_matrix = dict()
+        self.node_to_index = None
 
     def get_action_matrices_and_indices(self, concerned_action_keys: List[str],
                                         base_action_keys: List[str],
@@ -222,6 +251,7 @@ class NetworkPropagation(nx.DiGraph):
     def dump(self, file_prefix, path=None):
         path = path or "."
         file_path_and_name = os.path.join(path, "{}_{}.pkl".format(file_prefix, self.get_title()))
+        self.clear_action_matrix_cache()
         nx.write_gpickle(self, file_path_and_name)
         cprint("Dump: {}".format(file_path_and_name), "blue")
 
@@ -241,6 +271,8 @@ class NetworkPropagation(nx.DiGraph):
             else:
                 file_path_and_name = "NOT FOUND / {}".format(file_name_or_prefix)
                 loaded = False
+        if loaded:
+            loaded.clear_action_matrix_cache()
         cprint("Load: {}".format(file_path_and_name), "green")
         return loaded
 
@@ -253,6 +285,7 @@ class NetworkPropagation(nx.DiGraph):
         return max(last_times)
 
     def simulate_propagation(self):
+        self.clear_action_matrix_cache()
         for info, propagation in self.info_to_propagation.items():
             for t, parent_id, node_id in propagation:
                 self._run_event_listener("propagate", (t, parent_id, node_id), info=info)
@@ -267,6 +300,7 @@ class NetworkPropagation(nx.DiGraph):
         :param value: attribute value of edges
         """
         self.add_edge(u, v, **{action_key: value})
+        self.clear_action_matrix_cache()
 
     def get_info_attr(self, info, attr=None):
         if attr is None:
@@ -284,13 +318,17 @@ class NetworkPropagation(nx.DiGraph):
         return nx.get_node_attributes(self, attr)
 
     def set_attr_of_edge(self, edge: Tuple, attr, val):
-        nx.set_edge_attributes(self, {edge: val}, name=attr)
+        self.set_attr_of_edges({edge: val}, attr)
 
     def set_attr_of_node(self, node, attr, val):
         nx.set_node_attributes(self, {node: val}, name=attr)
 
     def set_attr_of_edges(self, edge_to_val: Dict, attr):
-        nx.set_edge_attributes(self, edge_to_val, name=attr)
+        # Not nx.set_edge_attributes, which uses self[u][v] overridden by self.__getitem__
+        for (u, v), val in edge_to_val.items():
+            if self.has_edge(u, v):
+                self.edges[u, v][attr] = val
+        self.clear_action_matrix_cache()
 
     def set_attr_of_nodes(self, node_to_val: Dict, attr):
         nx.set_node_attributes(self, node_to_val, name=attr)
@@ -54,6 +54,38 @@ class TestProp(unittest.TestCase):
                         [0.0, 0.0, 0.0, 0.0, 0.0]])
         ))
 
+    def test_prop_action_matrix_cache(self):
+        g = nu.get_scale_free_graph(n=5, seed=42)
+        prop = NetworkPropagation(g.nodes, g.edges(),
+                                  user_actions=["flag"], num_info=1, propagation=0.3,
+                                  is_verbose=False, seed=42)
+        prop.simulate_propagation()
+
+        for action_key in prop.get_actions():
+            for nodelist in [None, [3, 1, 0]]:
+                self.assertTrue(np.array_equal(
+                    prop.get_action_matrix(action_key, nodelist=nodelist, is_sparse_repr=True).toarray(),
+                    prop.get_action_matrix(action_key, nodelist=nodelist),
+                ))
+        self.assertTrue(np.array_equal(
+            nu.to_csr_matrix(prop, weight="follow").toarray(),
+            np.asarray(nu.to_numpy_matrix(prop, weight="follow", value_for_non_weight_exist=0)),
+        ))
+
+        self.assertEqual(prop.get_action_matrix("flag_0")[4, 0], 0)
+        prop.add_action(4, 0, "flag_0", 2)
+        self.assertEqual(prop.get_action_matrix("flag_0")[4, 0], 2)
+
+        prop.set_attr_of_edge((4, 0), "flag_0", 3)
+        self.assertEqual(prop.get_action_matrix("flag_0", nodelist=[0, 4])[1, 0], 3)
+
+        prop.set_attr_of_edges({(4, 0): 5}, "flag_0")
+        self.assertEqual(prop.get_action_matrix("flag_0", time_stamp=4)[4, 0], 0)
+        self.assertEqual(prop.get_action_matrix("flag_0")[4, 0], 5)
+
+        prop.dump("cache")
+        self.assertEqual(prop.action_to_csr_matrix, dict())
+
     def test_prop_dump_and_load(self):
         g = nu.get_scale_free_graph(n=20, seed=42)
         prop = NetworkPropagation(g.nodes, g.edges(),
@@ -169,9 +201,194 @@ class TestProp(unittest.TestCase):
             np.asarray([[0], [1]])
         ))
         self.assertEqual(data_loader.actions, ['follow', 'propagate'])
+        self.assertEqual(data_loader.num_classes, 2)
         self.assertEqual(xs_1.shape, (2, 5))
         self.assertTrue(np.array_equal(ys_1, np.asarray([0, 1])))
 
+        mats, xs, ys, batch = next(data_loader.get_batch_generator(batch_size=2, is_stacked_repr=True))
+        num_nodes_0 = len(data_loader.selected_node_indices[0])
+        self.assertTrue(np.array_equal(mats[0][:, -1:], np.asarray([[0], [1]]) + num_nodes_0))
+        self.assertEqual(xs.shape, (num_nodes_0 + 2, 5))
+        self.assertEqual(ys.shape, (2, 2))
+        self.assertTrue(np.array_equal(batch, np.asarray([0] * num_nodes_0 + [1, 1])))
+
+        data_loader.is_coo_repr = False
+        mats_1, _, _ = data_loader[1]
+        self.assertTrue(np.array_equal(mats_1[0], np.asarray([[0, 1], [0, 0]])))
+        with self.assertRaises(ValueError):
+            next(data_loader.get_batch_generator(is_stacked_repr=True))
+        data_loader.is_coo_repr = True
+
+        cached_data_loader = ActionMatrixLoader(path=".", actions=data_loader.actions, item_cache_size=1)
+        cached_data_loader.load("test_loader")
+        cached_data_loader.dump(name_prefix="test_loader")
+        reloaded_data_loader = ActionMatrixLoader(path=".", actions=data_loader.actions)
+        self.assertTrue(reloaded_data_loader.load("test_loader"))
+        self.assertTrue(np.array_equal(reloaded_data_loader.x_features, data_loader.x_features))
+
+        mats_1, xs_1, ys_1 = cached_data_loader[1]
+        self.assertIs(cached_data_loader[1][1], xs_1)
+        self.assertFalse(xs_1.flags.writeable)
+        self.assertTrue(np.array_equal(xs_1, data_loader[1][1]))
+
+        for shuffle in [False, True]:
+            train_ys = [y for _, _, ys in data_loader.get_batch_generator(shuffle=shuffle, seed=42, is_train=True,
+                                                                          train_ratio=0.5) for y in ys]
+            test_ys = [y for _, _, ys in data_loader.get_batch_generator(shuffle=shuffle, seed=42, is_train=False,
+                                                                         train_ratio=0.5) for y in ys]
+            self.assertEqual(len(train_ys), 1)
+            self.assertEqual(len(test_ys), 1)
+            self.assertFalse(np.array_equal(train_ys[0], test_ys[0]))
+
+        for (mats, xs, ys), (mats_w, xs_w, ys_w) in zip(data_loader.get_batch_generator(batch_size=1),
+                                                        data_loader.get_batch_generator(batch_size=1, num_workers=2)):
+            self.assertTrue(all(np.array_equal(m, m_w) for m, m_w in zip(mats[0], mats_w[0])))
+            self.assertTrue(np.array_equal(xs[0], xs_w[0]))
+            self.assertTrue(np.array_equal(ys[0], ys_w[0]))
+
+    def test_data_loader_num_classes(self):
+        data_loader = ActionMatrixLoader(path=".", actions=["follow"])
+        data_loader.update_matrices_and_indices(
+            matrices_sequence=[np.asarray([[[0, 1], [0, 0]]])] * 4,
+            selected_node_indices=[np.asarray([0, 1])] * 4,
+        )
+        data_loader.update_x_features(ones_feature(2, 3))
+        data_loader.update_ys(np.asarray([0, 1]))
+        data_loader.update_ys(np.asarray([3, 2]))
+        self.assertEqual(data_loader.num_classes, 4)
+
+        data_loader.dump(name_prefix="test_num_classes", num_subfiles=5)
+        loaded_data_loader = ActionMatrixLoader(path=".", actions=["follow"])
+        self.assertTrue(loaded_data_loader.load("test_num_classes"))
+        self.assertEqual(loaded_data_loader.num_classes, 4)
+        self.assertEqual(len(loaded_data_loader), 4)
+
+        legacy_instance = ActionMatrixLoader(path=".", actions=["follow"])
+        legacy_instance.update_matrices_and_indices(
+            matrices_sequence=[np.asarray([[[0, 1], [0, 0]]])],
+            selected_node_indices=[np.asarray([0, 1])],
+        )
+        legacy_instance.update_ys(np.eye(2)[:1])
+        legacy_instance.num_classes = 4
+        dump_batch(legacy_instance, path=".", name="legacy_num_classes_0.pkl")
+        loaded_data_loader = ActionMatrixLoader(path=".", actions=["follow"])
+        self.assertTrue(loaded_data_loader.load("legacy_num_classes"))
+        self.assertEqual(loaded_data_loader.num_classes, 2)
+
+    def test_data_loader_item_cache(self):
+        data_loader = ActionMatrixLoader(path=".", actions=["follow"], item_cache_size=2)
+        data_loader.update_matrices_and_indices(
+            matrices_sequence=[np.asarray([[[0, 1], [0, 0]]]), np.asarray([[[0, 0], [1, 0]]])],
+            selected_node_indices=[np.asarray([0, 1]), np.asarray([1, 2])],
+        )
+        data_loader.update_x_features(np.arange(6).reshape(3, 2))
+        data_loader.update_ys(np.asarray([0, 1]))
+
+        mats_1, xs_1, y_1 = data_loader[1]
+        self.assertEqual(y_1, 1)
+        self.assertIs(data_loader[1][1], xs_1)
+        self.assertFalse(xs_1.flags.writeable)
+
+        data_loader.is_coo_repr = False
+        self.assertTrue(np.array_equal(data_loader[1][0], np.asarray([[[0, 0], [1, 0]]])))
+        data_loader.is_coo_repr = True
+        data_loader.is_x_indices_repr = True
+        self.assertTrue(np.array_equal(data_loader[1][1], np.asarray([1, 2])))
+        data_loader.is_x_indices_repr = False
+
+        data_loader.x_features = np.arange(6).reshape(3, 2) * 10
+        self.assertTrue(np.array_equal(data_loader[1][1], np.asarray([[20, 30], [40, 50]])))
+        data_loader.ys = np.asarray([1, 0])
+        self.assertEqual(data_loader[1][-1], 0)
+
+        unpickled_data_loader = pickle.loads(pickle.dumps(data_loader))
+        self.assertEqual(unpickled_data_loader.item_cache_size, 2)
+        self.assertTrue(np.array_equal(unpickled_data_loader[1][1], data_loader[1][1]))
+
+    def test_data_loader_dump_more_subfiles_than_instances(self):
+        data_loader = ActionMatrixLoader(path=".", actions=["follow"])
+        data_loader.update_matrices_and_indices(
+            matrices_sequence=[np.asarray([[[0, 1], [0, 0]]])] * 4,
+            selected_node_indices=[np.asarray([0, 1])] * 4,
+        )
+        data_loader.update_x_features(ones_feature(2, 3))
+        data_loader.update_ys(np.asarray([0, 1, 1, 0]))
+        data_loader.update_y_features(np.arange(8).reshape(4, 2))
+
+        for num_subfiles in [3, 10]:
+            data_loader.dump(name_prefix="test_more_subfiles", num_subfiles=num_subfiles)
+            loaded_data_loader = ActionMatrixLoader(path=".", actions=["follow"])
+            self.assertTrue(loaded_data_loader.load("test_more_subfiles"))
+            self.assertEqual(len(loaded_data_loader), 4)
+            self.assertTrue(np.array_equal(loaded_data_loader.y_features, np.arange(8).reshape(4, 2)))
+            self.assertEqual(loaded_data_loader.num_y_features, 2)
+
+    def test_data_loader_dump_memory_mapped_x_features(self):
+        data_loader = ActionMatrixLoader(path=".", actions=["follow"])
+        data_loader.update_matrices_and_indices(
+            matrices_sequence=[np.asarray([[[0, 1], [0, 0]]])] * 2,
+            selected_node_indices=[np.asarray([0, 1])] * 2,
+        )
+        data_loader.update_x_features(np.arange(15).reshape(5, 3))
+        data_loader.update_ys(np.asarray([0, 1]))
+        data_loader.dump(name_prefix="test_memmap")
+
+        loaded_data_loader = ActionMatrixLoader(path=".", actions=["follow"])
+        self.assertTrue(loaded_data_loader.load("test_memmap"))
+        loaded_data_loader.x_features = loaded_data_loader.x_features[:3]
+        loaded_data_loader.dump(name_prefix="test_memmap")
+
+        reloaded_data_loader = ActionMatrixLoader(path=".", actions=["follow"])
+        self.assertTrue(reloaded_data_loader.load("test_memmap"))
+        self.assertTrue(np.array_equal(reloaded_data_loader.x_features, np.arange(9).reshape(3, 3)))
+
+    def test_dump_batches_keeps_previous_dump_on_failure(self):
+        dump_batches(instances=iter(["a", "b"]), num_instances=2, path=".", name="failing_dump.shards")
+
+        def failing_instances():
+            yield "c"
+            raise RuntimeError("Failed to build an instance")
+
+        with self.assertRaises(RuntimeError):
+            dump_batches(instances=failing_instances(), num_instances=2, path=".", name="failing_dump.shards")
+        self.assertEqual(list(load_batches(path=".", name="failing_dump.shards")), ["a", "b"])
+
+    def test_matrix_to_list(self):
+        matrix = np.asarray([[0, 2, 0],
+                             [0, 0, 0],
+                             [3, 0, 1]])
+        self.assertTrue(np.array_equal(
+            matrix_to_list(matrix),
+            np.asarray([[0, 1, 2], [2, 0, 3], [2, 2, 1]])
+        ))
+        self.assertTrue(np.array_equal(
+            matrix_to_list(matrix, default_value=2),
+            np.asarray([[0, 0, 0], [0, 2, 0], [1, 0, 0], [1, 1, 0], [1, 2, 0], [2, 0, 3], [2, 1, 0], [2, 2, 1]])
+        ))
+        self.assertEqual(matrix_to_list(np.zeros((2, 2))).shape, (0, 3))
+
+    def test_list_to_matrix(self):
+        matrix = np.asarray([[0, 2, 0],
+                             [0, 0, 0],
+                             [3, 0, 1]])
+        self.assertTrue(np.array_equal(list_to_matrix(matrix_to_list(matrix), size=3), matrix))
+        self.assertTrue(np.array_equal(list_to_matrix([[0, 1, 5]], size=2), np.asarray([[0, 5], [0, 0]])))
+        self.assertTrue(np.array_equal(list_to_matrix([], size=2, default_value=-1), np.full((2, 2), -1)))
+
+    def test_delta_encode_sequence(self):
+        sequence = [np.asarray([3, 5, 9]), np.asarray([], dtype=np.int64), np.asarray([7, 2])]
+        deltas, pointers = delta_encode_sequence(sequence)
+        self.assertEqual(deltas.dtype, np.int32)
+        self.assertTrue(np.array_equal(pointers, np.asarray([0, 3, 3, 5])))
+        for x, decoded in zip(sequence, delta_decode_sequence(deltas, pointers)):
+            self.assertTrue(np.array_equal(x, decoded))
+        with self.assertRaises(OverflowError):
+            delta_encode_sequence([np.asarray([0, 2 ** 31])])
+
+    def test_list_to_edge_attr(self):
+        self.assertTrue(np.array_equal(list_to_edge_attr([[0, 1, 5], [1, 0, 7]]), np.asarray([5, 7])))
+        self.assertEqual(list_to_edge_attr([]).shape, (0,))
+
 
 if __name__ == '__main__':
     unittest.main()